@@ -1,19 +1,32 @@
 import os
+import re
 import json
+import time
+import hashlib
+import heapq
 import asyncio
 import logging
 from typing import Optional
-from collections import defaultdict
+from collections import deque, OrderedDict
+from itertools import islice
 from datetime import datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
 import discord
 from discord.ext import commands
 import anthropic
+import httpx
 import boto3
 from dotenv import load_dotenv
 import shutil
 import base64
 
+# orjson serializes/parses JSON in C, typically 3-5x faster than stdlib.
+# Fall back to stdlib json so the bot still runs without the dependency.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,6 +36,21 @@ logging.getLogger('discord.gateway').setLevel(logging.WARNING)
 logging.getLogger('discord.http').setLevel(logging.WARNING)
 logging.getLogger('httpx').setLevel(logging.WARNING)
 
+# Read .env once at import; the getters below only consult os.environ
+load_dotenv()
+
+
+def json_loads(data):
+    """Parse JSON from bytes or str, using orjson when available."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def json_dumps(obj, indent: bool = False) -> bytes:
+    """Serialize to JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None).encode('utf-8')
+
 
 class ClaudeBot:
     """
@@ -33,36 +61,131 @@ class ClaudeBot:
     # Configuration constants
     MAX_TOKENS_PER_CHANNEL = 10000          # 10k token limit per channel (storage)
     MESSAGE_EXPIRY_DAYS = 12                # Remove messages older than 12 days
-    CHARS_PER_TOKEN_ESTIMATE = 4            # Rough estimate for token counting
+    CHARS_PER_TOKEN_ESTIMATE = 3            # Conservative: ~4 holds for plain English but
+                                            # over-counts chars/token on code and non-Latin text
     MAX_RESPONSE_TOKENS = 300               # Keep responses brief
     SCORE_THRESHOLD = 8                     # Only respond if score >= 8
-    CACHE_FILE = 'conversation_cache.json'  # Persistent cache file
+    SCORE_CACHE_SIZE = 1024                 # LRU entries for repeated-context scores
+    IMAGE_CACHE_SIZE = 64                   # LRU entries for encoded image payloads
+    CACHE_DIR = 'conversation_cache'        # One cache shard file per channel
+    LEGACY_CACHE_FILE = 'conversation_cache.json'  # Pre-shard single-file cache
 
     # Batching and context limits
     BATCH_WINDOW_SECONDS = 5                # Collect messages for 5 seconds before processing
+    MAX_CONTENT_CHARS = 4000                # Discord's hard cap (Nitro); bounds string work
+    SAVE_DEBOUNCE_SECONDS = 10              # Coalesce cache writes into one flush per window
+    B64_THREAD_THRESHOLD_BYTES = 256 * 1024  # Base64-encode bigger images off the event loop
     HAIKU_CONTEXT_TOKENS = 2000             # ~2k tokens to Haiku for scoring
     SONNET_CONTEXT_TOKENS = 4500            # ~4.5k tokens to Sonnet for response
 
     # Listen-only: cache messages for context, but only respond if mentioned
-    LISTEN_ONLY_CATEGORIES = {"Information"}
-    LISTEN_ONLY_CHANNELS = {"readings", "github-profiles", "linkedin"}
+    LISTEN_ONLY_CATEGORIES = frozenset({"Information"})
+    LISTEN_ONLY_CHANNELS = frozenset({"readings", "github-profiles", "linkedin"})
 
     # Timezone for conversation history dividers
     DISPLAY_TIMEZONE = ZoneInfo("America/New_York")
 
+    # Matches "claudebot" / "claude bot" without lowercasing every message
+    MENTION_PATTERN = re.compile(r"claude\s?bot", re.IGNORECASE)
+
+    # Pulls "SCORE: N" lines out of scorer output without splitting it
+    SCORE_PATTERN = re.compile(r"^\s*SCORE:\s*(-?\d+)\s*$", re.MULTILINE)
+
+    # Static prompts, built once at class creation instead of per call
+    SCORING_INSTRUCTIONS = """
+You are a helpful, witty Discord bot in a casual server. - decide if ClaudeBot should respond to the new messages based on the following criteria:
+- Take Previous conversation and new messages into account
+- Only respond if you can add a valuable input OR be witty (be selective, not all messages need a response)
+- If someone shares good news, celebrate with them!
+
+- 10: Directly mentioned ([MENTIONED]) - always respond
+- 9: Someone sharing big news worth celebrating (promotion, graduation, new job)
+- 8-9: Opportunity to be witty/funny, OR a question requiring expertise others maybe/likely don't have
+- 5-7: Simple questions anyone could answer, mild interest but not needed
+- 0-4: Normal chat, skip
+
+Note: If someone said "Claude" it doesn't mean they're talking to you. Check context to determine if they're talking about ClaudeBot or Claude the AI service.
+
+Frequency check: If ClaudeBot appears in the last 10 messages of "Previous conversation", subtract 2 from your score.
+
+Just output: SCORE: X"""
+
+    SYSTEM_PROMPT = """you're claudebot, a chill member of this discord server. you run on claude sonnet 4.5.
+
+vibes:
+- keep it to 1-3 sentences max
+- be helpful when someone needs it, be funny/witty when there's an opening
+- match the energy of the chat
+- celebrate wins, roast bad takes, drop knowledge when relevant
+- never end with a question
+- type in all lowercase"""
+
     def __init__(self):
         self.discord_token: Optional[str] = None
         self.claude_api_key: Optional[str] = None
-        self.claude_client: Optional[anthropic.Anthropic] = None
+        self.claude_client: Optional[anthropic.AsyncAnthropic] = None
+        self.secrets_client = None  # shared boto3 Secrets Manager client
         self.bot: Optional[commands.Bot] = None
+        self.bot_user_id: Optional[int] = None
         self.start_time: Optional[datetime] = None
-
-        # Conversation cache: category_name -> channel_id -> list of messages
-        self.conversation_cache = defaultdict(lambda: defaultdict(list))
+        self.start_monotonic: Optional[float] = None  # uptime base, immune to clock jumps
+
+        # Conversation cache: (category_name, channel_id) -> deque of messages.
+        # Flat keys mean one hash probe per lookup and no per-category dicts;
+        # deques make oldest-first eviction O(1) instead of list.pop(0)'s O(N)
+        self.conversation_cache: dict[tuple[str, int], deque] = {}
+
+        # Pre-rendered history lines per (category, channel_id), kept in
+        # lockstep with conversation_cache so history reads are a plain join
+        # instead of re-formatting every cached message
+        self.rendered_lines: dict[tuple[str, int], deque] = {}
+        self.rendered_counts: dict[tuple[str, int], deque] = {}  # lines per message (1, or 2 with divider)
+        self.last_hour_key: dict[tuple[str, int], tuple] = {}
+
+        # Cached channel_id -> (category_name, channel_name); walking
+        # discord.py's guild state per access adds up on the hot path
+        self.channel_meta: dict[int, tuple[str, str]] = {}
+
+        # Prompt headers per (channel_name, category): (scorer, responder).
+        # Keyed by content, so renames simply mint a new entry
+        self.prompt_headers: dict[tuple[str, str], tuple[str, str]] = {}
+
+        # System blocks built once; reusing the same objects avoids per-call
+        # dict allocation and keeps the cache breakpoints identical
+        self.haiku_system = [{
+            "type": "text",
+            "text": self.SCORING_INSTRUCTIONS,
+            "cache_control": {"type": "ephemeral"}
+        }]
+        self.sonnet_system = [{
+            "type": "text",
+            "text": self.SYSTEM_PROMPT,
+            "cache_control": {"type": "ephemeral"}
+        }]
+
+        # Rolling estimated-token total per (category, channel_id), updated
+        # on append/evict so limit checks don't rescan the channel
+        self.channel_token_counts: dict[tuple[str, int], int] = {}
 
         # Batching: collect messages before processing
         self.pending_messages: dict[int, list[dict]] = {}  # channel_id -> list of message data
         self.batch_tasks: dict[int, asyncio.Task] = {}     # channel_id -> pending batch task
+        self.channel_locks: dict[int, asyncio.Lock] = {}   # guards the two dicts above
+
+        # LRU of context-fingerprint -> Haiku score, so identical contexts
+        # (spam, repeated stickers/emoji) don't pay for a second scoring call
+        self.score_cache: OrderedDict[bytes, int] = OrderedDict()
+
+        # LRU of image-content hash -> (media_type, base64), so reposts and
+        # reply chains referencing the same image skip re-encoding
+        self.image_b64_cache: OrderedDict[bytes, tuple[str, str]] = OrderedDict()
+
+        # Debounced cache persistence; only dirty channels get rewritten
+        self.save_task: Optional[asyncio.Task] = None
+        self.dirty_channels: set[tuple[str, int]] = set()
+
+        # Set by setup_slash_commands; flushes bot_data.json on shutdown
+        self.flush_bot_data = None
 
         # Load persistent cache on startup
         self.load_cache()
@@ -73,7 +196,9 @@ class ClaudeBot:
 
     def get_claude_api_key(self) -> str:
         """Get Claude API key from .env (local) or AWS Secrets Manager (production)."""
-        load_dotenv()
+        if self.claude_api_key:
+            return self.claude_api_key
+
         key = os.getenv("CLAUDE_API_KEY")
         if key:
             logger.info("Using local development API key")
@@ -96,8 +221,11 @@ class ClaudeBot:
             secret_name = os.getenv("AWS_SECRET_NAME")
             if not secret_name:
                 raise ValueError("AWS_SECRET_NAME environment variable not set")
-            client = boto3.client('secretsmanager', region_name=region)
-            response = client.get_secret_value(SecretId=secret_name)
+            if self.secrets_client is None:
+                # boto3 client construction is expensive (endpoint discovery);
+                # build it once and reuse across refreshes
+                self.secrets_client = boto3.client('secretsmanager', region_name=region)
+            response = self.secrets_client.get_secret_value(SecretId=secret_name)
             secret_data = json.loads(response['SecretString'])
             return secret_data['claude_api_key']
         except Exception as e:
@@ -106,7 +234,6 @@ class ClaudeBot:
 
     def get_discord_token(self) -> str:
         """Get Discord bot token from environment."""
-        load_dotenv()
         token = os.getenv("DISCORD_TOKEN")
         if token:
             logger.info("Discord token retrieved")
@@ -120,12 +247,22 @@ class ClaudeBot:
             self.discord_token = self.get_discord_token()
             self.claude_api_key = self.get_claude_api_key()
 
-            self.claude_client = anthropic.Anthropic(api_key=self.claude_api_key)
+            # One shared connection pool for every Claude call; keepalive
+            # connections amortize TLS handshakes across bursty traffic
+            self.claude_client = anthropic.AsyncAnthropic(
+                api_key=self.claude_api_key,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=100,
+                        max_keepalive_connections=50
+                    ),
+                    timeout=httpx.Timeout(600.0, connect=5.0)
+                )
+            )
             logger.info("Claude client initialized")
 
             intents = discord.Intents.default()
             intents.message_content = True
-            intents.presences = True
             intents.guilds = True
 
             self.bot = commands.Bot(command_prefix='/', intents=intents, help_command=None)
@@ -137,140 +274,294 @@ class ClaudeBot:
     # Persistent Cache (Save/Load)
     # =========================================================================
 
+    def shard_path(self, channel_id: int) -> str:
+        """Path of a channel's cache shard (channel ids are globally unique)."""
+        return os.path.join(self.CACHE_DIR, f"{channel_id}.json")
+
     def load_cache(self):
-        """Load conversation cache from file on startup."""
+        """Load conversation cache shards from disk on startup."""
+        if not os.path.isdir(self.CACHE_DIR):
+            self.load_legacy_cache()
+            return
+
+        total_msgs = 0
         try:
-            with open(self.CACHE_FILE, 'r') as f:
-                data = json.load(f)
+            for entry in os.scandir(self.CACHE_DIR):
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    with open(entry.path, 'rb') as f:
+                        shard = json_loads(f.read())
+                    category = shard['category']
+                    channel_id = int(shard['channel_id'])
+                    for msg in shard['messages']:
+                        # Convert ISO string back to datetime
+                        msg['timestamp'] = datetime.fromisoformat(msg['timestamp'])
+                        self.conversation_cache.setdefault((category, channel_id), deque()).append(msg)
+                        self.append_rendered_line(category, channel_id, msg)
+                    total_msgs += len(shard['messages'])
+                except Exception as e:
+                    logger.warning(f"Skipping unreadable cache shard {entry.name}: {e}")
+
+            logger.info(f"Loaded {total_msgs} messages from {self.CACHE_DIR}")
+        except Exception as e:
+            logger.warning(f"Error loading cache: {e}, starting fresh")
+
+    def load_legacy_cache(self):
+        """One-time migration from the old single-file cache format."""
+        try:
+            with open(self.LEGACY_CACHE_FILE, 'rb') as f:
+                data = json_loads(f.read())
 
-            # Reconstruct the nested defaultdict with datetime conversion
+            total_msgs = 0
             for category, channels in data.items():
                 for channel_id_str, messages in channels.items():
                     channel_id = int(channel_id_str)
                     for msg in messages:
-                        # Convert ISO string back to datetime
                         msg['timestamp'] = datetime.fromisoformat(msg['timestamp'])
-                        self.conversation_cache[category][channel_id].append(msg)
+                        self.conversation_cache.setdefault((category, channel_id), deque()).append(msg)
+                        self.append_rendered_line(category, channel_id, msg)
+                    total_msgs += len(messages)
+                    # Mark dirty so the next save writes the new shard format
+                    self.dirty_channels.add((category, channel_id))
 
-            total_msgs = sum(
-                len(msgs) for channels in self.conversation_cache.values()
-                for msgs in channels.values()
-            )
-            logger.info(f"Loaded {total_msgs} messages from cache file")
+            logger.info(f"Migrated {total_msgs} messages from legacy cache file")
         except FileNotFoundError:
             logger.info("No existing cache file, starting fresh")
         except Exception as e:
             logger.warning(f"Error loading cache: {e}, starting fresh")
 
-    def save_cache(self):
-        """Save conversation cache to file using atomic write to prevent corruption."""
-        temp_file = self.CACHE_FILE + '.tmp'
+    def save_channel_shard(self, category: str, channel_id: int, messages: list):
+        """Atomically write (or remove, when empty) one channel's shard file."""
+        path = self.shard_path(channel_id)
+        if not messages:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return
+
+        # deques aren't JSON-serializable, so snapshot to a list
+        shard = {"category": category, "channel_id": channel_id, "messages": list(messages)}
+        if orjson is not None:
+            # orjson serializes datetimes and int keys natively,
+            # so no per-message copies are needed
+            payload = orjson.dumps(shard, option=orjson.OPT_NON_STR_KEYS)
+        else:
+            shard["messages"] = [
+                {**msg, 'timestamp': msg['timestamp'].isoformat()}
+                for msg in messages
+            ]
+            payload = json.dumps(shard).encode('utf-8')
+
+        temp_file = path + '.tmp'
         try:
-            # Convert to regular dict and serialize datetimes
-            data = {}
-            for category, channels in self.conversation_cache.items():
-                data[category] = {}
-                for channel_id, messages in channels.items():
-                    data[category][str(channel_id)] = [
-                        {
-                            **msg,
-                            'timestamp': msg['timestamp'].isoformat()
-                        }
-                        for msg in messages
-                    ]
-
-            # Write to temp file first - if crash happens here, the original cache file is still intact
-            with open(temp_file, 'w') as f:
-                json.dump(data, f, indent=2)
-
-            # replaces cache file only after temp file is fully written
-            os.replace(temp_file, self.CACHE_FILE)
-
-            total_msgs = sum(
-                len(msgs) for channels in self.conversation_cache.values()
-                for msgs in channels.values()
-            )
-            logger.info(f"Saved {total_msgs} messages to cache file")
-        except Exception as e:
-            logger.error(f"Error saving cache: {e}")
-            # Clean up temp file if it exists from a failed write
+            # Write to temp file first - if crash happens here, the original shard is still intact
+            with open(temp_file, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_file, path)
+        except Exception:
             if os.path.exists(temp_file):
                 try:
                     os.remove(temp_file)
                 except OSError:
                     logger.warning(f"Could not clean up temp file: {temp_file}")
+            raise
+
+    def save_cache(self):
+        """Write the shards of channels that changed since the last save."""
+        try:
+            dirty = self.dirty_channels
+            if not dirty:
+                return
+            self.dirty_channels = set()
+
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            for category, channel_id in dirty:
+                messages = self.conversation_cache.get((category, channel_id), [])
+                self.save_channel_shard(category, channel_id, messages)
+
+            logger.info("Saved %d cache shard(s)", len(dirty))
+        except Exception as e:
+            logger.error(f"Error saving cache: {e}")
+
+    def schedule_cache_save(self):
+        """Debounce cache persistence so bursts of batches share one write."""
+        if self.save_task is None or self.save_task.done():
+            self.save_task = asyncio.create_task(self.save_cache_after_delay())
+
+    async def save_cache_after_delay(self):
+        """Wait out the debounce window, then write the cache off the event loop."""
+        try:
+            await asyncio.sleep(self.SAVE_DEBOUNCE_SECONDS)
+            await asyncio.to_thread(self.save_cache)
+        except Exception as e:
+            logger.error(f"Error in debounced cache save: {e}")
 
     def backup_cache(self):
-        """Create a rolling backup of the cache file before destructive operations."""
-        # tmp file to avoid corruption
-        backup_file = self.CACHE_FILE + '.backup' 
-        temp_file = backup_file + '.tmp'
+        """Create a rolling backup of the cache shards before destructive operations."""
+        backup_dir = self.CACHE_DIR + '.backup'
         try:
-            if os.path.exists(self.CACHE_FILE):
-                shutil.copy2(self.CACHE_FILE, temp_file)
-                os.replace(temp_file, backup_file)
-                logger.info(f"Cache backup saved to {backup_file}")
+            # Flush pending changes so the backup reflects current state
+            self.save_cache()
+            if os.path.isdir(self.CACHE_DIR):
+                shutil.rmtree(backup_dir, ignore_errors=True)
+                shutil.copytree(self.CACHE_DIR, backup_dir)
+                logger.info(f"Cache backup saved to {backup_dir}")
         except Exception as e:
             logger.error(f"Error creating cache backup: {e}")
-            if os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                except OSError:
-                    pass
 
     # =========================================================================
     # Conversation Cache Management
     # =========================================================================
 
+    def channel_meta_for(self, channel) -> tuple[str, str]:
+        """Cached (category_name, channel_name) lookup for a channel."""
+        meta = self.channel_meta.get(channel.id)
+        if meta is None:
+            meta = (channel.category.name if channel.category else "Uncategorized",
+                    channel.name)
+            self.channel_meta[channel.id] = meta
+        return meta
+
+    def prompt_headers_for(self, channel_name: str, category: str) -> tuple[str, str]:
+        """Cached (scorer, responder) prompt headers for a channel."""
+        key = (channel_name, category)
+        headers = self.prompt_headers.get(key)
+        if headers is None:
+            base = f"[#{channel_name} in {category}]\n"
+            headers = (base + "Previous conversation:\n",
+                       base + "Recent conversation:\n")
+            self.prompt_headers[key] = headers
+        return headers
+
     def estimate_tokens(self, text: str) -> int:
         """
         Estimate token count from text.
-        Uses ~4 chars per token which is a reasonable approximation for English.
-        For exact counts, you'd need tiktoken with cl100k_base encoding.
+        Uses ~3 chars per token so code-heavy or non-Latin messages don't
+        blow past API budgets. For exact counts, you'd need a real tokenizer.
         """
         # Character-based estimate for cache management
         return len(text) // self.CHARS_PER_TOKEN_ESTIMATE
 
+    def estimate_message_tokens(self, msg: dict) -> int:
+        """Estimate tokens for a cached message without allocating the
+        "user: content" string (+2 for the ": " separator)."""
+        return (len(msg['user']) + len(msg['content']) + 2) // self.CHARS_PER_TOKEN_ESTIMATE
+
     def get_channel_token_count(self, category: str, channel_id: int) -> int:
-        """Calculate total estimated tokens for a channel's conversation history."""
-        messages = self.conversation_cache[category][channel_id]
-        total = 0
-        for msg in messages:
-            total += self.estimate_tokens(f"{msg['user']}: {msg['content']}")
-        return total
-
-    def cleanup_old_messages(self, category: str, channel_id: int):
+        """Total estimated tokens for a channel, from the rolling counter."""
+        return self.channel_token_counts.get((category, channel_id), 0)
+
+    def render_divider(self, msg_time: datetime) -> str:
+        """Render an hourly divider line for the conversation history."""
+        time_str = self.format_hour(msg_time)
+        return f"--- {msg_time.strftime('%b')} {msg_time.day}, {time_str} ET ---"
+
+    def render_message_line(self, msg: dict) -> str:
+        """Render a single cached message as a conversation history line."""
+        reply_author = msg.get('reply_author')
+        reply_content = msg.get('reply_content')
+
+        if reply_author:
+            if reply_content:
+                return f'{msg["user"]} [replying to {reply_author}: "{reply_content}"]: {msg["content"]}'
+            return f'{msg["user"]} [replying to {reply_author}]: {msg["content"]}'
+        return f"{msg['user']}: {msg['content']}"
+
+    def append_rendered_line(self, category: str, channel_id: int, msg: dict):
+        """Pre-render a newly cached message (plus hourly divider if the hour changed)
+        and fold its token estimate into the rolling channel counter."""
+        key = (category, channel_id)
+        lines = self.rendered_lines.setdefault(key, deque())
+        counts = self.rendered_counts.setdefault(key, deque())
+
+        # Store the estimate on the entry so eviction can subtract it in O(1)
+        msg['_tok'] = self.estimate_message_tokens(msg)
+        self.channel_token_counts[key] = self.channel_token_counts.get(key, 0) + msg['_tok']
+
+        msg_time = msg['timestamp'].astimezone(self.DISPLAY_TIMEZONE)
+        hour_key = (msg_time.date(), msg_time.hour)
+
+        line_count = 1
+        if hour_key != self.last_hour_key.get(key):
+            self.last_hour_key[key] = hour_key
+            lines.append(self.render_divider(msg_time))
+            line_count = 2
+
+        lines.append(self.render_message_line(msg))
+        counts.append(line_count)
+
+    def evict_oldest_message(self, category: str, channel_id: int):
+        """Remove the oldest cached message along with its pre-rendered lines."""
+        messages = self.conversation_cache.get((category, channel_id))
+        if not messages:
+            return
+        msg = messages.popleft()
+
+        key = (category, channel_id)
+        tok = msg.get('_tok')
+        if tok is None:
+            tok = self.estimate_message_tokens(msg)
+        self.channel_token_counts[key] = max(0, self.channel_token_counts.get(key, 0) - tok)
+
+        counts = self.rendered_counts.get(key)
+        if counts:
+            # Dropping a divider that trailing same-hour messages shared is
+            # acceptable drift; the next hour change re-inserts one
+            for _ in range(counts.popleft()):
+                self.rendered_lines[key].popleft()
+
+    def clear_rendered_cache(self, category: str = None, channel_id: int = None):
+        """Drop pre-rendered lines for one channel, or for everything."""
+        if category is None:
+            self.rendered_lines.clear()
+            self.rendered_counts.clear()
+            self.last_hour_key.clear()
+            self.channel_token_counts.clear()
+            return
+        key = (category, channel_id)
+        self.rendered_lines.pop(key, None)
+        self.rendered_counts.pop(key, None)
+        self.last_hour_key.pop(key, None)
+        self.channel_token_counts.pop(key, None)
+
+    def cleanup_old_messages(self, category: str, channel_id: int,
+                             now: Optional[datetime] = None):
         """Remove messages older than MESSAGE_EXPIRY_DAYS."""
-        cutoff = datetime.now(timezone.utc) - timedelta(days=self.MESSAGE_EXPIRY_DAYS)
-        messages = self.conversation_cache[category][channel_id]
-
-        # Filter out old messages
-        original_count = len(messages)
-        self.conversation_cache[category][channel_id] = [
-            msg for msg in messages if msg['timestamp'] > cutoff
-        ]
+        if now is None:
+            now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=self.MESSAGE_EXPIRY_DAYS)
+        messages = self.conversation_cache.get((category, channel_id), [])
+
+        # Messages are appended in timestamp order, so expired ones form a
+        # prefix - pop from the front instead of rebuilding the whole list
+        removed = 0
+        while messages and messages[0]['timestamp'] <= cutoff:
+            self.evict_oldest_message(category, channel_id)
+            removed += 1
 
-        removed = original_count - len(self.conversation_cache[category][channel_id])
         if removed > 0:
-            logger.info(f"Cleaned up {removed} messages older than {self.MESSAGE_EXPIRY_DAYS} days")
+            logger.info("Cleaned up %d messages older than %d days",
+                        removed, self.MESSAGE_EXPIRY_DAYS)
 
     def enforce_token_limit(self, category: str, channel_id: int):
         """Remove oldest messages if channel exceeds token limit."""
         while self.get_channel_token_count(category, channel_id) > self.MAX_TOKENS_PER_CHANNEL:
-            messages = self.conversation_cache[category][channel_id]
+            messages = self.conversation_cache.get((category, channel_id))
             if messages:
-                messages.pop(0)  # Remove oldest message
+                self.evict_oldest_message(category, channel_id)
                 logger.info("Removed old message to stay under token limit")
             else:
                 break
 
     def add_message_to_cache(self, message: discord.Message,
                              reply_author: str = None, reply_content: str = None,
-                             reply_has_images: bool = False):
+                             reply_has_images: bool = False,
+                             content: str = None, image_count: int = None):
         """Add a message to the conversation cache (including listen-only channels for context)."""
-        category = message.channel.category.name if message.channel.category else "Uncategorized"
+        category, channel_name = self.channel_meta_for(message.channel)
         channel_id = message.channel.id
-        channel_name = message.channel.name
         
         # Truncate reply content if too long
         if reply_content and len(reply_content) > 50:
@@ -282,55 +573,59 @@ class ClaudeBot:
         elif reply_has_images:
             reply_content = "[image]"
 
-        # Build content with image marker if message has images
-        content = message.content.strip()
-        image_count = sum(
-            1 for att in message.attachments
-            if att.content_type and att.content_type.startswith('image/')
-        )
+        # Build content with image marker if message has images.
+        # process_batch passes both in so they aren't re-derived here
+        if content is None:
+            content = message.content.strip()
+        if image_count is None:
+            image_count = sum(
+                1 for att in message.attachments
+                if att.content_type and att.content_type.startswith('image/')
+            )
         if image_count:
             marker = f" [shared {image_count} image{'s' if image_count > 1 else ''}]"
             content += marker
 
-        # Create message entry
+        # Create message entry (grab the clock once and reuse it for cleanup)
+        now = datetime.now(timezone.utc)
         msg_entry = {
             "user": message.author.display_name,
             "content": content,
-            "timestamp": datetime.now(timezone.utc),
+            "timestamp": now,
             "channel_name": channel_name,
             "reply_author": reply_author,
             "reply_content": reply_content
         }
 
         # Add to cache
-        self.conversation_cache[category][channel_id].append(msg_entry)
+        self.conversation_cache.setdefault((category, channel_id), deque()).append(msg_entry)
+        self.append_rendered_line(category, channel_id, msg_entry)
+        self.dirty_channels.add((category, channel_id))
 
         # Remove old messages and enforce token limit
-        self.cleanup_old_messages(category, channel_id)
+        self.cleanup_old_messages(category, channel_id, now=now)
         self.enforce_token_limit(category, channel_id)
 
     def add_bot_response_to_cache(self, message: discord.Message):
         """Add ClaudeBot's own response to cache for context continuity."""
-        if not message.channel.category:
-            category = "Uncategorized"
-        else:
-            category = message.channel.category.name
-
-        channel_name = message.channel.name
+        category, channel_name = self.channel_meta_for(message.channel)
         channel_id = message.channel.id
 
         # Use "ClaudeBot" in conversation history
+        now = datetime.now(timezone.utc)
         msg_entry = {
             "user": "ClaudeBot",
             "content": message.content.strip(),
-            "timestamp": datetime.now(timezone.utc),
+            "timestamp": now,
             "channel_name": channel_name,
             "reply_author": None,
             "reply_content": None
         }
 
-        self.conversation_cache[category][channel_id].append(msg_entry)
-        self.cleanup_old_messages(category, channel_id)
+        self.conversation_cache.setdefault((category, channel_id), deque()).append(msg_entry)
+        self.append_rendered_line(category, channel_id, msg_entry)
+        self.dirty_channels.add((category, channel_id))
+        self.cleanup_old_messages(category, channel_id, now=now)
         self.enforce_token_limit(category, channel_id)
 
     def format_hour(self, dt: datetime) -> str:
@@ -347,47 +642,37 @@ class ClaudeBot:
 
     def get_conversation_history(self, message: discord.Message) -> str:
         """Build formatted conversation history for Claude."""
-        category = message.channel.category.name if message.channel.category else "Uncategorized"
+        category = self.channel_meta_for(message.channel)[0]
         channel_id = message.channel.id
 
-        messages = self.conversation_cache[category][channel_id]
-
-        if not messages:
+        # Lines (with hourly dividers) are pre-rendered at append time,
+        # so history is just a join
+        lines = self.rendered_lines.get((category, channel_id))
+        if not lines:
             return ""
-
-        # Format conversation history with hourly dividers
-        lines = []
-        current_hour_key = None
-
-        for msg in messages:
-            # Insert hourly divider when the hour changes
-            msg_time = msg['timestamp'].astimezone(self.DISPLAY_TIMEZONE)
-            hour_key = (msg_time.date(), msg_time.hour)
-            if hour_key != current_hour_key:
-                current_hour_key = hour_key
-                time_str = self.format_hour(msg_time)
-                lines.append(f"--- {msg_time.strftime('%b')} {msg_time.day}, {time_str} ET ---")
-
-            reply_author = msg.get('reply_author')
-            reply_content = msg.get('reply_content')
-
-            if reply_author:
-                if reply_content:
-                    lines.append(f'{msg["user"]} [replying to {reply_author}: "{reply_content}"]: {msg["content"]}')
-                else:
-                    lines.append(f'{msg["user"]} [replying to {reply_author}]: {msg["content"]}')
-            else:
-                lines.append(f"{msg['user']}: {msg['content']}")
-
         return "\n".join(lines)
 
     def get_trimmed_history(self, message: discord.Message, max_tokens: int) -> str:
         """Get conversation history trimmed to max_tokens (keeps most recent)."""
-        history = self.get_conversation_history(message)
-        # Trim from the start (oldest) to fit within limit, keeping newest
-        while self.estimate_tokens(history) > max_tokens and '\n' in history:
-            history = history.split('\n', 1)[1]
-        return history
+        category = self.channel_meta_for(message.channel)[0]
+        lines = self.rendered_lines.get((category, message.channel.id))
+        if not lines:
+            return ""
+
+        # Walk from the newest line backwards, counting chars (+1 per joining
+        # newline) until the token budget is spent - no string reallocation
+        budget_chars = max_tokens * self.CHARS_PER_TOKEN_ESTIMATE
+        kept = 0
+        total_chars = 0
+        for line in reversed(lines):
+            total_chars += len(line) + 1
+            if total_chars > budget_chars and kept > 0:
+                break
+            kept += 1
+
+        if kept == len(lines):
+            return "\n".join(lines)
+        return "\n".join(islice(lines, len(lines) - kept, None))
 
     # =========================================================================
     # Discord Event Handlers
@@ -397,26 +682,37 @@ class ClaudeBot:
         @self.bot.event
         async def on_ready():
             logger.info(f"{self.bot.user} connected to Discord!")
+            self.bot_user_id = self.bot.user.id
             try:
                 synced = await self.bot.tree.sync()
                 logger.info(f"Synced {len(synced)} slash commands")
 
                 if self.start_time is None:
                     self.start_time = datetime.now(timezone.utc)
+                    self.start_monotonic = time.monotonic()
                     logger.info(f"Bot started at {self.start_time}")
 
             except Exception as e:
                 logger.error(f"Failed to setup events: {e}")
 
+        @self.bot.event
+        async def on_guild_channel_update(before, after):
+            # Renames / recategorizations invalidate the cached metadata
+            self.channel_meta.pop(after.id, None)
+
         @self.bot.event
         async def on_message(message: discord.Message):
+            # Hottest handler: hoist the author once and compare ids against
+            # the cached bot_user_id instead of walking self.bot.user per event
+            author = message.author
+
             # Add bot's OWN responses to cache for context continuity
-            if message.author == self.bot.user:
+            if author.id == self.bot_user_id:
                 self.add_bot_response_to_cache(message)
                 return
 
             # Skip other bots entirely
-            if message.author.bot:
+            if author.bot:
                 return
 
             await self.handle_message(message)
@@ -425,18 +721,68 @@ class ClaudeBot:
     # Image Detection
     # =========================================================================
 
+    # Magic-byte prefixes keyed by length (WEBP needs its own two-part check)
+    IMAGE_MAGIC = {
+        b'\xff\xd8\xff': 'image/jpeg',
+        b'\x89PNG': 'image/png',
+        b'GIF87a': 'image/gif',
+        b'GIF89a': 'image/gif',
+    }
+
     def detect_image_type(self, image_data: bytes) -> str:
         """Detect image MIME type from binary data."""
-        if image_data.startswith(b'\xff\xd8\xff'):
-            return 'image/jpeg'
-        elif image_data.startswith(b'\x89PNG\r\n\x1a\n'):
-            return 'image/png'
-        elif len(image_data) >= 12 and image_data.startswith(b'RIFF') and image_data[8:12] == b'WEBP':
+        head = bytes(image_data[:12])
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
             return 'image/webp'
-        elif image_data.startswith(b'GIF87a') or image_data.startswith(b'GIF89a'):
-            return 'image/gif'
-        else:
-            return 'image/png'  # Default fallback
+        return (self.IMAGE_MAGIC.get(head[:3])
+                or self.IMAGE_MAGIC.get(head[:4])
+                or self.IMAGE_MAGIC.get(head[:6])
+                or 'image/png')  # Default fallback
+
+    async def download_images(self, attachments) -> list[dict]:
+        """Download image attachments concurrently and build Claude image blocks."""
+        image_atts = [
+            att for att in attachments
+            if att.content_type and att.content_type.startswith('image/')
+        ]
+        if not image_atts:
+            return []
+
+        # Fetch in parallel so wall time is the slowest download, not the sum
+        image_datas = await asyncio.gather(*(att.read() for att in image_atts))
+
+        blocks = []
+        for image_data in image_datas:
+            # Reposts and reply chains re-send the same bytes; a small LRU
+            # keyed on content hash skips re-encoding them
+            cache_key = hashlib.blake2b(image_data, digest_size=16).digest()
+            cached = self.image_b64_cache.get(cache_key)
+            if cached is not None:
+                self.image_b64_cache.move_to_end(cache_key)
+                media_type, base64_image = cached
+            else:
+                if len(image_data) > self.B64_THREAD_THRESHOLD_BYTES:
+                    # Encoding multi-MB attachments inline would stall the
+                    # event loop (and Discord heartbeats); push to a thread
+                    encoded = await asyncio.to_thread(base64.b64encode, image_data)
+                else:
+                    encoded = base64.b64encode(image_data)
+                # base64 output is pure ASCII; the ascii decoder skips the
+                # UTF-8 validation pass over the (potentially multi-MB) payload
+                base64_image = encoded.decode('ascii')
+                media_type = self.detect_image_type(image_data)
+                self.image_b64_cache[cache_key] = (media_type, base64_image)
+                if len(self.image_b64_cache) > self.IMAGE_CACHE_SIZE:
+                    self.image_b64_cache.popitem(last=False)
+            blocks.append({
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": media_type,
+                    "data": base64_image
+                }
+            })
+        return blocks
 
     # =========================================================================
     # Message Handling
@@ -449,7 +795,9 @@ class ClaudeBot:
             if not message.guild:
                 return
 
-            message_content = message.content.strip()
+            # Cap before any string ops so a max-length message can't
+            # inflate per-message CPU
+            message_content = message.content[:self.MAX_CONTENT_CHARS].strip()
             if not message_content and not message.attachments:
                 return
 
@@ -460,10 +808,10 @@ class ClaudeBot:
             #     logger.info(f"Skipping message in guild: {message.guild.id} - {message.guild.name}")
             #     return
 
-            # Check if bot was mentioned
-            was_mentioned = self.bot.user in message.mentions
-            content_lower = message_content.lower()
-            text_mentioned = 'claudebot' in content_lower or 'claude bot' in content_lower
+            # Check if bot was mentioned (compare ids - no user-object scan)
+            was_mentioned = any(u.id == self.bot_user_id for u in message.mentions)
+            text_mentioned = bool(message_content) and bool(
+                self.MENTION_PATTERN.search(message_content))
             any_mention = was_mentioned or text_mentioned
 
             # Build message data for batch
@@ -475,67 +823,57 @@ class ClaudeBot:
                 "reply_author": None,
                 "reply_content": None,
                 "reply_has_images": False,
-                "reply_images": [],
-                "images": []
+                "reply_image_atts": [],
+                "image_atts": []
             }
 
             # Capture reply context if this is a reply
             if message.reference:
                 try:
-                    referenced_message = await message.channel.fetch_message(message.reference.message_id)
+                    # discord.py usually has the referenced message in its
+                    # cache already; only pay the REST round-trip when not
+                    referenced_message = message.reference.resolved
+                    if not isinstance(referenced_message, discord.Message):
+                        referenced_message = message.reference.cached_message
+                    if referenced_message is None:
+                        referenced_message = await message.channel.fetch_message(
+                            message.reference.message_id)
                     if referenced_message:
                         msg_data["reply_author"] = referenced_message.author.display_name
-                        msg_data["reply_content"] = referenced_message.content or None
-                        msg_data["reply_has_images"] = any(
-                            att.content_type and att.content_type.startswith('image/')
-                            for att in referenced_message.attachments
-                        )
-
-                        # Capture referenced images
-                        for attachment in referenced_message.attachments:
-                            if attachment.content_type and attachment.content_type.startswith('image/'):
-                                image_data = await attachment.read()
-                                base64_image = base64.b64encode(image_data).decode('utf-8')
-                                media_type = self.detect_image_type(image_data)
-                                msg_data["reply_images"].append({
-                                    "type": "image",
-                                    "source": {
-                                        "type": "base64",
-                                        "media_type": media_type,
-                                        "data": base64_image
-                                    }
-                                })
+                        msg_data["reply_content"] = (
+                            referenced_message.content[:self.MAX_CONTENT_CHARS] or None)
+                        # Record image attachments; downloads are deferred
+                        # until the batch decides to respond
+                        msg_data["reply_image_atts"] = [
+                            att for att in referenced_message.attachments
+                            if att.content_type and att.content_type.startswith('image/')
+                        ]
+                        msg_data["reply_has_images"] = bool(msg_data["reply_image_atts"])
                 except Exception as e:
-                    logger.warning(f"Could not fetch referenced message: {e}")
-
-            # Capture current message images
-            for attachment in message.attachments:
-                if attachment.content_type and attachment.content_type.startswith('image/'):
-                    image_data = await attachment.read()
-                    base64_image = base64.b64encode(image_data).decode('utf-8')
-                    media_type = self.detect_image_type(image_data)
-                    msg_data["images"].append({
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": media_type,
-                            "data": base64_image
-                        }
-                    })
-
-            # Add to pending batch
-            if channel_id not in self.pending_messages:
-                self.pending_messages[channel_id] = []
-            self.pending_messages[channel_id].append(msg_data)
-
-            # Start batch timer only if one isn't already running (5-second window)
-            if channel_id not in self.batch_tasks:
-                self.batch_tasks[channel_id] = asyncio.create_task(
-                    self.process_batch_after_delay(channel_id)
-                )
+                    logger.warning("Could not fetch referenced message: %s", e)
+
+            # Record current message image attachments (not downloaded yet)
+            msg_data["image_atts"] = [
+                att for att in message.attachments
+                if att.content_type and att.content_type.startswith('image/')
+            ]
+
+            # Add to pending batch under the channel lock so a concurrent
+            # process_batch can't pop the list mid-append or double-start a timer
+            lock = self.channel_locks.setdefault(channel_id, asyncio.Lock())
+            async with lock:
+                if channel_id not in self.pending_messages:
+                    self.pending_messages[channel_id] = []
+                self.pending_messages[channel_id].append(msg_data)
+
+                # Start batch timer only if one isn't already running (5-second window)
+                if channel_id not in self.batch_tasks:
+                    self.batch_tasks[channel_id] = asyncio.create_task(
+                        self.process_batch_after_delay(channel_id)
+                    )
 
         except Exception as e:
-            logger.error(f"Error handling message: {e}")
+            logger.error("Error handling message: %s", e)
 
     async def process_batch_after_delay(self, channel_id: int):
         """Wait for batch window, then process accumulated messages."""
@@ -545,14 +883,56 @@ class ClaudeBot:
         except Exception as e:
             logger.error(f"Error in batch delay: {e}")
 
+    def format_prompt_line(self, msg_data: dict) -> str:
+        """Format one batched message as a prompt line (with reply context if replying)."""
+        mention_marker = "[MENTIONED] " if msg_data["mentioned"] else ""
+
+        if msg_data["reply_author"]:
+            # Build reply indicator: [replying to Alice: "content" + image]
+            reply_parts = []
+            if msg_data["reply_content"]:
+                # Truncate reply content
+                reply_text = msg_data["reply_content"]
+                if len(reply_text) > 25:
+                    reply_text = reply_text[:25] + "..."
+                reply_parts.append(f'"{reply_text}"')
+            if msg_data["reply_has_images"]:
+                reply_parts.append("image")
+
+            reply_info = " + ".join(reply_parts) if reply_parts else "message"
+            return f'{mention_marker}{msg_data["user"]} [replying to {msg_data["reply_author"]}: {reply_info}]: {msg_data["content"]}'
+        return f'{mention_marker}{msg_data["user"]}: {msg_data["content"]}'
+
+    async def attach_batch_images(self, batch: list, latest_content: list) -> list:
+        """Download a batch's images and weave them in after their text lines.
+
+        Runs only once the mention/score gate has decided a response will
+        happen, so skipped batches never pay for attachment downloads.
+        """
+        content = []
+        for msg_data, text_block in zip(batch, latest_content):
+            content.append(text_block)
+
+            if msg_data["reply_image_atts"]:
+                reply_images = await self.download_images(msg_data["reply_image_atts"])
+                if reply_images:
+                    content.append({"type": "text", "text": f"{msg_data['reply_author']}'s referenced image:"})
+                    content.extend(reply_images)
+
+            if msg_data["image_atts"]:
+                images = await self.download_images(msg_data["image_atts"])
+                if images:
+                    content.append({"type": "text", "text": f"{msg_data['user']}'s image:"})
+                    content.extend(images)
+
+        return content
+
     async def process_batch(self, channel_id: int):
         """Process all pending messages for a channel."""
-        if channel_id not in self.pending_messages:
-            return
-
-        batch = self.pending_messages.pop(channel_id)
-        if channel_id in self.batch_tasks:
-            del self.batch_tasks[channel_id]
+        lock = self.channel_locks.setdefault(channel_id, asyncio.Lock())
+        async with lock:
+            batch = self.pending_messages.pop(channel_id, None)
+            self.batch_tasks.pop(channel_id, None)
 
         if not batch:
             return
@@ -561,8 +941,7 @@ class ClaudeBot:
             # Get channel info from first message
             first_msg = batch[0]["message_obj"]
             channel = first_msg.channel
-            category = channel.category.name if channel.category else "Uncategorized"
-            channel_name = channel.name
+            category, channel_name = self.channel_meta_for(channel)
 
             # Check if this is a listen-only channel
             is_listen_only = (
@@ -571,41 +950,12 @@ class ClaudeBot:
             )
             any_mentioned = any(msg_data["mentioned"] for msg_data in batch)
 
-            # Build content array maintaining proper order: text -> images for each message
-            latest_content = []
-
-            for msg_data in batch:
-                # Build the message line (with reply context if replying)
-                mention_marker = "[MENTIONED] " if msg_data["mentioned"] else ""
-
-                if msg_data["reply_author"]:
-                    # Build reply indicator: [replying to Alice: "content" + image]
-                    reply_parts = []
-                    if msg_data["reply_content"]:
-                        # Truncate reply content
-                        reply_text = msg_data["reply_content"]
-                        if len(reply_text) > 25:
-                            reply_text = reply_text[:25] + "..."
-                        reply_parts.append(f'"{reply_text}"')
-                    if msg_data["reply_has_images"]:
-                        reply_parts.append("image")
-
-                    reply_info = " + ".join(reply_parts) if reply_parts else "message"
-                    msg_text = f'{mention_marker}{msg_data["user"]} [replying to {msg_data["reply_author"]}: {reply_info}]: {msg_data["content"]}'
-                else:
-                    msg_text = f'{mention_marker}{msg_data["user"]}: {msg_data["content"]}'
-
-                latest_content.append({"type": "text", "text": msg_text})
-
-                # Add referenced images with label (if replying to an image)
-                if msg_data["reply_images"]:
-                    latest_content.append({"type": "text", "text": f"{msg_data['reply_author']}'s referenced image:"})
-                    latest_content.extend(msg_data["reply_images"])
-
-                # Add the message's own images with label
-                if msg_data["images"]:
-                    latest_content.append({"type": "text", "text": f"{msg_data['user']}'s image:"})
-                    latest_content.extend(msg_data["images"])
+            # Build text-only content for gating/scoring; most batches never
+            # pass the score gate, so image bytes aren't fetched for them
+            latest_content = [
+                {"type": "text", "text": self.format_prompt_line(msg_data)}
+                for msg_data in batch
+            ]
 
             # Get trimmed history before adding batch to cache 
             haiku_history = self.get_trimmed_history(first_msg, self.HAIKU_CONTEXT_TOKENS)
@@ -617,41 +967,64 @@ class ClaudeBot:
                     msg_data["message_obj"],
                     msg_data.get("reply_author"),
                     msg_data.get("reply_content"),
-                    msg_data.get("reply_has_images", False)
+                    msg_data.get("reply_has_images", False),
+                    content=msg_data["content"],
+                    image_count=len(msg_data["image_atts"])
                 )
 
-            # Save cache after each batch
-            self.save_cache()
+            # Schedule a debounced cache save instead of writing per batch
+            self.schedule_cache_save()
 
             # Handle listen-only channels: only respond if mentioned
             if is_listen_only and not any_mentioned:
-                logger.info(f"Listen-only #{channel_name} - no mention, skipping API calls")
+                logger.info("Listen-only #%s - no mention, skipping API calls", channel_name)
                 return
 
             # If mentioned anywhere, skip Haiku and go straight to Sonnet
             if any_mentioned:
-                logger.info(f"Mentioned in #{channel_name} - sending to Sonnet to respond directly")
+                logger.info("Mentioned in #%s - sending to Sonnet to respond directly", channel_name)
+                full_content = await self.attach_batch_images(batch, latest_content)
                 response = await self.generate_response(
-                    sonnet_history, latest_content, channel_name, category)
+                    sonnet_history, full_content, channel_name, category)
                 if response:
                     await self.send_long_message(channel, response)
                 return
 
-            # Regular channel, no mention: Score with Haiku
-            score = await self.score_message(haiku_history, latest_content, channel_name, category)
+            # Regular channel, no mention: Score with Haiku. Identical
+            # history+text contexts reuse the cached score (image blocks are
+            # not fingerprinted; identical text with different images is rare)
+            score_key = hashlib.blake2b(
+                "||".join(
+                    [haiku_history] +
+                    [block["text"] for block in latest_content if block["type"] == "text"]
+                ).encode(), digest_size=16).digest()
+
+            score = self.score_cache.get(score_key)
+            if score is not None:
+                self.score_cache.move_to_end(score_key)
+                logger.info("Score cache hit in #%s: %s", channel_name, score)
+            else:
+                score = await self.score_message(haiku_history, latest_content, channel_name, category)
+                if score is not None:
+                    self.score_cache[score_key] = score
+                    if len(self.score_cache) > self.SCORE_CACHE_SIZE:
+                        self.score_cache.popitem(last=False)
 
-            preview = " | ".join(m["content"][:15] for m in batch)
-            logger.info(f"[SCORE: {score}] #{channel_name} - {len(batch)} msg(s) - \"{preview}\"")
+            if logger.isEnabledFor(logging.INFO):
+                preview = " | ".join(m["content"][:15] for m in batch)
+                logger.info("[SCORE: %s] #%s - %d msg(s) - \"%s\"",
+                            score, channel_name, len(batch), preview)
 
             if score is None or score < self.SCORE_THRESHOLD:
-                logger.info(f"Skipping response in #{channel_name} - Score: {score}")
+                logger.info("Skipping response in #%s - Score: %s", channel_name, score)
                 return
 
+            full_content = await self.attach_batch_images(batch, latest_content)
             response = await self.generate_response(
-                sonnet_history, latest_content, channel_name, category)
+                sonnet_history, full_content, channel_name, category)
 
             if response:
-                logger.info(f"Sending response in #{channel_name}")
+                logger.info("Sending response in #%s", channel_name)
                 await self.send_long_message(channel, response)
 
         except discord.errors.HTTPException as e:
@@ -667,45 +1040,35 @@ class ClaudeBot:
                             channel_name: str, category: str) -> Optional[int]:
         """Score whether to respond using Haiku (cheap and fast)."""
         try:
-            # Build content: header, history, then new messages with their images
+            # Build content: cached header, history, then new messages
+            header = self.prompt_headers_for(channel_name, category)[0]
             content = [
-                {"type": "text", "text": f"""[#{channel_name} in {category}]
-Previous conversation:
-{haiku_history}
-
-[New messages]
-"""}
+                {"type": "text", "text": header + haiku_history + "\n\n[New messages]\n"}
             ]
 
             # Add new messages with their images in proper order
             content.extend(latest_content)
 
-            # Add scoring instructions at the end
-            content.append({"type": "text", "text": """
-You are a helpful, witty Discord bot in a casual server. - decide if ClaudeBot should respond to the new messages based on the following criteria:
-- Take Previous conversation and new messages into account
-- Only respond if you can add a valuable input OR be witty (be selective, not all messages need a response)
-- If someone shares good news, celebrate with them!
-
-- 10: Directly mentioned ([MENTIONED]) - always respond
-- 9: Someone sharing big news worth celebrating (promotion, graduation, new job)
-- 8-9: Opportunity to be witty/funny, OR a question requiring expertise others maybe/likely don't have
-- 5-7: Simple questions anyone could answer, mild interest but not needed
-- 0-4: Normal chat, skip
-
-Note: If someone said "Claude" it doesn't mean they're talking to you. Check context to determine if they're talking about ClaudeBot or Claude the AI service.
-
-Frequency check: If ClaudeBot appears in the last 10 messages of "Previous conversation", subtract 2 from your score.
-
-Just output: SCORE: X"""})
-
-            response = await asyncio.to_thread(
-                self.claude_client.messages.create,
+            response = await self.claude_client.messages.create(
                 model="claude-haiku-4-5-20251001",
-                max_tokens=20,
+                # Just enough room for "SCORE: 10"; the model stops right
+                # after the score instead of padding out the budget
+                max_tokens=8,
+                stop_sequences=["\n\n"],
+                # Static rubric in system with a cache breakpoint so
+                # Anthropic reuses its KV state across scoring calls
+                system=self.haiku_system,
                 messages=[{"role": "user", "content": content}]
             )
 
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                logger.debug(
+                    "Scorer cache: %s read / %s written tokens",
+                    getattr(usage, 'cache_read_input_tokens', 0),
+                    getattr(usage, 'cache_creation_input_tokens', 0)
+                )
+
             return self.extract_score(response.content[0].text)
 
         except Exception as e:
@@ -716,35 +1079,28 @@ Just output: SCORE: X"""})
                                 channel_name: str, category: str) -> Optional[str]:
         """Generate response using Sonnet (only called when score >= threshold)."""
         try:
-            # Build content: header, history, then new messages with their images
+            # Build content: header+history as its own block with a cache
+            # breakpoint (history is append-only between calls, so the prefix
+            # usually matches), then new messages in a separate uncached tail
+            header = self.prompt_headers_for(channel_name, category)[1]
             content = [
-                {"type": "text", "text": f"""[#{channel_name} in {category}]
-Recent conversation:
-{sonnet_history}
-
-[New messages]
-"""}
+                {
+                    "type": "text",
+                    "text": header + sonnet_history,
+                    "cache_control": {"type": "ephemeral"}
+                },
+                {"type": "text", "text": "\n[New messages]\n"}
             ]
 
             # Add new messages with their images in proper order
             content.extend(latest_content)
 
-            system_prompt = """you're claudebot, a chill member of this discord server. you run on claude sonnet 4.5.
-
-vibes:
-- keep it to 1-3 sentences max
-- be helpful when someone needs it, be funny/witty when there's an opening
-- match the energy of the chat
-- celebrate wins, roast bad takes, drop knowledge when relevant
-- never end with a question
-- type in all lowercase"""
-
-            response = await asyncio.to_thread(
-                self.claude_client.messages.create,
+            response = await self.claude_client.messages.create(
                 model="claude-sonnet-4-5-20250929",
                 max_tokens=self.MAX_RESPONSE_TOKENS,
                 temperature=0.7,
-                system=system_prompt,
+                # Same breakpoint treatment as the scorer's rubric
+                system=self.sonnet_system,
                 messages=[{"role": "user", "content": content}]
             )
 
@@ -757,28 +1113,41 @@ vibes:
     def extract_score(self, response: str) -> Optional[int]:
         """Extract the SCORE: X value from Claude's response."""
         try:
-            lines = response.strip().split('\n')
-            for line in reversed(lines):
-                line = line.strip()
-                if line.startswith("SCORE:"):
-                    score_str = line.replace("SCORE:", "").strip()
-                    return int(score_str)
-            return None
+            # Single compiled scan; with the scorer capped to the score line
+            # the first match is the only one, so search() can stop early
+            match = self.SCORE_PATTERN.search(response)
+            return int(match.group(1)) if match else None
         except Exception as e:
             logger.warning(f"Error extracting score: {e}")
             return None
 
     async def send_long_message(self, channel: discord.TextChannel, content: str):
         """Send a message, splitting if it exceeds Discord's limit."""
-        content = content.lower()
+        # islower() bails on the first uppercase char, so already-lowercase
+        # model output (the system prompt demands it) skips the full copy
+        if not content.islower():
+            content = content.lower()
         max_length = 2000
         try:
             if len(content) <= max_length:
                 await channel.send(content)
             else:
-                chunks = [content[i:i+max_length] for i in range(0, len(content), max_length)]
-                for chunk in chunks:
-                    await channel.send(chunk)
+                # Slice lazily as each send completes, preferring to break at
+                # a newline so paragraphs and code fences aren't cut mid-line;
+                # a hard cut only happens when one line exceeds the window.
+                # Sends stay sequential because Discord only guarantees
+                # ordering for awaited-in-order channel sends
+                i, length = 0, len(content)
+                while i < length:
+                    j = min(i + max_length, length)
+                    if j < length:
+                        k = content.rfind('\n', i + max_length // 2, j)
+                        if k != -1:
+                            j = k + 1
+                    chunk = content[i:j]
+                    if chunk.strip():
+                        await channel.send(chunk)
+                    i = j
         except Exception as e:
             logger.error(f"Error sending message: {e}")
 
@@ -807,23 +1176,42 @@ vibes:
             beer_counter = 0
             logger.error(f"Error loading data file: {e}")
 
+        beer_save_task: Optional[asyncio.Task] = None
+
+        def write_beer_data():
+            # Atomic write so a crash mid-write can't corrupt the data file
+            temp_file = data_file + '.tmp'
+            with open(temp_file, 'wb') as f:
+                f.write(json_dumps({'beer_counter': beer_counter}))
+            os.replace(temp_file, data_file)
+
+        async def save_beer_after_delay():
+            await asyncio.sleep(self.SAVE_DEBOUNCE_SECONDS)
+            try:
+                await asyncio.to_thread(write_beer_data)
+            except Exception as e:
+                logger.error("Failed to save beer counter: %s", e)
+
+        def schedule_beer_save():
+            # Same debounce shape as schedule_cache_save: rapid /beer bursts
+            # coalesce into a single disk write per window
+            nonlocal beer_save_task
+            if beer_save_task is not None and not beer_save_task.done():
+                return
+            beer_save_task = asyncio.create_task(save_beer_after_delay())
+
+        # Final flush on shutdown, alongside save_cache in main()
+        self.flush_bot_data = write_beer_data
+
         @self.bot.tree.command(name="beer", description="Share a beer with ClaudeBot")
         async def beer_command(interaction: discord.Interaction):
             nonlocal beer_counter
-            try:
-                beer_counter += 1
-                with open(data_file, 'w') as f:
-                    json.dump({'beer_counter': beer_counter}, f)
-                await interaction.response.send_message(
-                    f"Cheers! {beer_counter} beers shared with ClaudeBot"
-                )
-                logger.info(f"Beer #{beer_counter} by {interaction.user.display_name}")
-            except Exception as e:
-                beer_counter -= 1
-                logger.error(f"Failed to save beer counter: {e}")
-                await interaction.response.send_message(
-                    "I've had too many for now, thanks though"
-                )
+            beer_counter += 1
+            schedule_beer_save()
+            await interaction.response.send_message(
+                f"Cheers! {beer_counter} beers shared with ClaudeBot"
+            )
+            logger.info("Beer #%d by %s", beer_counter, interaction.user.display_name)
 
         @self.bot.tree.command(name="ping", description="Check bot latency")
         async def ping_command(interaction: discord.Interaction):
@@ -832,10 +1220,11 @@ vibes:
 
         @self.bot.tree.command(name="uptime", description="Check bot uptime")
         async def uptime_command(interaction: discord.Interaction):
-            if self.start_time:
-                delta = datetime.now(timezone.utc) - self.start_time
-                days = delta.days
-                hours, remainder = divmod(delta.seconds, 3600)
+            if self.start_monotonic is not None:
+                # Monotonic diff: no tz conversion, unaffected by NTP steps
+                elapsed = int(time.monotonic() - self.start_monotonic)
+                days, remainder = divmod(elapsed, 86400)
+                hours, remainder = divmod(remainder, 3600)
                 minutes, seconds = divmod(remainder, 60)
                 await interaction.response.send_message(
                     f"Uptime: {days}d {hours}h {minutes}m {seconds}s"
@@ -852,9 +1241,9 @@ vibes:
         ):
             # If specific channel requested
             if channel:
-                category = channel.category.name if channel.category else "Uncategorized"
+                category = self.channel_meta_for(channel)[0]
                 channel_id = channel.id
-                messages = self.conversation_cache.get(category, {}).get(channel_id, [])
+                messages = self.conversation_cache.get((category, channel_id), [])
 
                 if messages:
                     msg_count = len(messages)
@@ -874,22 +1263,33 @@ vibes:
                 logger.info(f"Cache stats for #{channel.name} requested by {interaction.user.display_name}")
                 return
 
-            # Show all channels summary
+            # Show all channels summary: only the top 10 by token count get
+            # formatted, so busy servers don't pay for strings they never see
+            populated = [key for key, messages in self.conversation_cache.items()
+                         if messages]
+            total_messages = sum(
+                len(self.conversation_cache[key]) for key in populated
+            )
+            top = heapq.nlargest(
+                10, populated,
+                key=lambda key: self.channel_token_counts.get(key, 0)
+            )
+
             stats = []
-            total_messages = 0
-            for category, channels in self.conversation_cache.items():
-                for ch_id, messages in channels.items():
-                    if messages:
-                        ch_name = messages[0].get('channel_name', 'unknown')
-                        msg_count = len(messages)
-                        total_messages += msg_count
-                        tokens = self.get_channel_token_count(category, ch_id)
-                        stats.append(f"#{ch_name}: {msg_count} msgs (~{tokens:,} tokens)")
+            for (category, ch_id) in top:
+                messages = self.conversation_cache[(category, ch_id)]
+                # Channel name is channel metadata, not message data; only
+                # fall back to the stored per-message copy for channels not
+                # yet seen live this session
+                meta = self.channel_meta.get(ch_id)
+                ch_name = meta[1] if meta else messages[0].get('channel_name', 'unknown')
+                tokens = self.get_channel_token_count(category, ch_id)
+                stats.append(f"#{ch_name}: {len(messages)} msgs (~{tokens:,} tokens)")
 
             if stats:
-                response = f"**Cache Stats:**\n" + "\n".join(stats[:10])
-                if len(stats) > 10:
-                    response += f"\n*(showing 10 of {len(stats)} channels)*"
+                response = f"**Cache Stats:**\n" + "\n".join(stats)
+                if len(populated) > 10:
+                    response += f"\n*(showing top 10 of {len(populated)} channels)*"
                 response += f"\n\n**Total:** {total_messages} messages cached"
             else:
                 response = "No messages cached yet."
@@ -908,13 +1308,18 @@ vibes:
 
             if channel:
                 # Clear specific channel
-                category = channel.category.name if channel.category else "Uncategorized"
+                category = self.channel_meta_for(channel)[0]
                 channel_id = channel.id
 
-                if category in self.conversation_cache and channel_id in self.conversation_cache[category]:
-                    msg_count = len(self.conversation_cache[category][channel_id])
-                    del self.conversation_cache[category][channel_id]
-                    self.save_cache()
+                key = (category, channel_id)
+                if key in self.conversation_cache:
+                    msg_count = len(self.conversation_cache[key])
+                    del self.conversation_cache[key]
+                    self.clear_rendered_cache(category, channel_id)
+                    # Dirty-marking an emptied channel deletes its shard on the
+                    # next debounced flush; the interaction doesn't wait on disk
+                    self.dirty_channels.add((category, channel_id))
+                    self.schedule_cache_save()
                     await interaction.response.send_message(
                         f"Cleared {msg_count} messages from #{channel.name} cache."
                     )
@@ -922,14 +1327,12 @@ vibes:
                 else:
                     await interaction.response.send_message(f"No cache found for #{channel.name}")
             else:
-                # Clear all channels
-                total_msgs = sum(
-                    len(msgs) for channels in self.conversation_cache.values()
-                    for msgs in channels.values()
-                )
+                # Clear all channels; map(len, ...) keeps the count loop in C
+                total_msgs = sum(map(len, self.conversation_cache.values()))
                 self.conversation_cache.clear()
-                self.conversation_cache = defaultdict(lambda: defaultdict(list))
-                self.save_cache()
+                self.clear_rendered_cache()
+                self.dirty_channels.clear()
+                shutil.rmtree(self.CACHE_DIR, ignore_errors=True)
                 await interaction.response.send_message(
                     f"Cleared all cache ({total_msgs} messages across all channels)."
                 )
@@ -938,22 +1341,21 @@ vibes:
         @self.bot.tree.command(name="restore-cache", description="Restore cache from last backup")
         @discord.app_commands.default_permissions(manage_messages=True)
         async def restore_cache_command(interaction: discord.Interaction):
-            backup_file = self.CACHE_FILE + '.backup'
-            if not os.path.exists(backup_file):
-                await interaction.response.send_message("No backup file found.")
+            backup_dir = self.CACHE_DIR + '.backup'
+            if not os.path.isdir(backup_dir):
+                await interaction.response.send_message("No backup found.")
                 return
 
             try:
-                shutil.copy2(backup_file, self.CACHE_FILE)
-                # Reload in-memory cache from restored file
+                shutil.rmtree(self.CACHE_DIR, ignore_errors=True)
+                shutil.copytree(backup_dir, self.CACHE_DIR)
+                # Reload in-memory cache from restored shards
                 self.conversation_cache.clear()
-                self.conversation_cache = defaultdict(lambda: defaultdict(list))
+                self.clear_rendered_cache()
+                self.dirty_channels.clear()
                 self.load_cache()
 
-                total_msgs = sum(
-                    len(msgs) for channels in self.conversation_cache.values()
-                    for msgs in channels.values()
-                )
+                total_msgs = sum(map(len, self.conversation_cache.values()))
                 await interaction.response.send_message(
                     f"Cache restored from backup ({total_msgs} messages)."
                 )
@@ -977,6 +1379,9 @@ vibes:
         except Exception as e:
             logger.error(f"Error starting bot: {e}")
             raise
+        finally:
+            if self.claude_client is not None:
+                await self.claude_client.close()
 
 
 def main():
@@ -985,6 +1390,11 @@ def main():
         asyncio.run(bot.start())
     except Exception as e:
         logger.error(f"Bot crashed: {e}")
+    finally:
+        # Flush anything a pending debounced save hadn't written yet
+        bot.save_cache()
+        if bot.flush_bot_data is not None:
+            bot.flush_bot_data()
 
 
 if __name__ == "__main__":